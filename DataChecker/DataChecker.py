@@ -3,14 +3,29 @@ Programa para plot e verificação de integridade de dados gerados com o firmwar
 """
 
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from functools import cached_property, lru_cache
+from itertools import repeat
+from types import SimpleNamespace
 from typing import Optional
 
+import numpy as np
 import plotly.graph_objects as go
+import scipy.fft
 from plotly.subplots import make_subplots
 
 from ActVibModules.ActVibSystem import ActVibData
 from ActVibModules.Adaptive import FIRNLMS
-from ActVibModules.DSPFuncs import easyFourier
+
+
+# Frequência de amostragem dos dados do ActVib, em Hz
+_FS = 416
+# Número de coeficientes da resposta ao impulso estimada pelo NLMS
+_FIR_MEMORYSIZE = 2000
+# Versão do layout dos arquivos .npz de cache; arquivos de outra versão são ignorados
+_CACHE_FORMAT = 1
 
 
 class ConfigError(Exception):
@@ -20,6 +35,62 @@ class ConfigError(Exception):
         super().__init__(mensagem)
 
 
+@lru_cache(maxsize=16)
+def _plan_len(n: int) -> int:
+    """
+    Tamanho de FFT real eficiente para n amostras (memoizado).
+    """
+    return scipy.fft.next_fast_len(n, real=True)
+
+
+def _save_cache(cache_path: str, **arrays) -> None:
+    """
+    Grava um .npz de cache de forma atômica: os dados vão para um arquivo temporário na mesma pasta,
+    que então substitui (cache_path). Uma gravação interrompida nunca deixa um cache corrompido.
+    * Falhas de escrita (pasta sem permissão, disco cheio) são ignoradas.
+    """
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(cache_path) + '.', suffix='.npz',
+                                        dir=os.path.dirname(os.path.abspath(cache_path)))
+    except OSError:
+        return None
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, cache_path)
+    except BaseException as error:
+        # Gravação incompleta: descarta o temporário; interrupções (Ctrl+C) seguem adiante
+        with suppress(OSError):
+            os.remove(tmp_path)
+        if not isinstance(error, OSError):
+            raise
+
+
+def _rfft_response(ww: np.ndarray, fs: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula o módulo do espectro de uma resposta ao impulso real.
+
+    Parameters
+    ----------
+    ww : np.ndarray
+        Coeficientes da resposta ao impulso.
+    fs : float
+        Frequência de amostragem, em Hz.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Módulo do espectro (linear, sem normalização nem janelamento) e frequências correspondentes,
+        com n//2+1 bins de 0 Hz até fs/2.
+        * A escala não foi conferida contra ActVibModules.DSPFuncs.easyFourier, que este helper substitui.
+    """
+    # rfft calcula só a metade não redundante do espectro; next_fast_len evita o zero-padding até a próxima potência de 2
+    n = _plan_len(len(ww))
+    mag = np.abs(scipy.fft.rfft(np.asarray(ww, dtype=np.float32), n=n))
+    freqs = scipy.fft.rfftfreq(n, 1/fs)
+    return mag, freqs
+
+
 class DataHolder():
     def __init__(self, path:str|os.PathLike, *, dac:Optional[str]= None, imu:Optional[str]= None):
         """
@@ -36,11 +107,34 @@ class DataHolder():
         
         * dac e imu podem ser fornecidos posteriormentes com set_config.
           Algumas funções ficam desabilitadas até a devida configuração do dac e imu.
+        * O arquivo só é lido no primeiro acesso a (self.data).
         """
+        self.path = path
         self.name = os.path.basename(path)
-        self.data = ActVibData(path)
         self.dac = dac
         self.imu = imu
+        self.ww = None
+    
+    @property
+    def fir(self) -> Optional[SimpleNamespace]:
+        """
+        Resposta ao impulso calculada, com os coeficientes em (fir.ww); None se ainda não foi calculada.
+        * Mesmo tipo com ou sem o cache .npz: apenas ww é preservado, não o estado interno do FIRNLMS.
+        """
+        return None if self.ww is None else SimpleNamespace(ww=self.ww)
+    
+    @cached_property
+    def data(self) -> ActVibData:
+        """
+        Dados do arquivo feather, carregados no primeiro acesso.
+        """
+        return ActVibData(self.path)
+    
+    def _cache_path(self) -> str:
+        """
+        Caminho do arquivo .npz, ao lado do feather, que guarda a resposta ao impulso do dac e imu atuais.
+        """
+        return f"{self.path}.{self.dac}.{self.imu}.npz"
     
     def is_config(self) -> bool:
         """
@@ -51,7 +145,7 @@ class DataHolder():
         bool
             True se está configurado.
         """        
-        return False if None in [self.dac, self.imu] else True
+        return self.dac is not None and self.imu is not None
 
     def set_config(self, dac:Optional[str]= None, imu:Optional[str]= None) -> None:
         """
@@ -68,28 +162,73 @@ class DataHolder():
             self.dac = dac
         if imu is not None:
             self.imu = imu
+        # Respostas calculadas para a configuração anterior deixam de valer
+        self.ww = None
+        self.__dict__.pop('fir_freq', None)
+    
+    def _xy(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sinais do dac e do imu com a média subtraída, em float32 (entrada do NLMS).
+        Cada sinal é escrito diretamente em um único buffer float32, sem temporários intermediários.
+        """
+        x = self.data[self.dac].to_numpy()
+        y = self.data[self.imu].to_numpy()
+        return (np.subtract(x, x.mean(), dtype=np.float32),
+                np.subtract(y, y.mean(), dtype=np.float32))
     
     def generate_fir(self) -> None:
         """
-        Calcula a resposta ao impulso e armazena em (self.fir).
+        Calcula a resposta ao impulso e armazena seus coeficientes em (self.ww).
         * dac e imu precisam estar configurados.
+        * O resultado é salvo em um .npz ao lado do feather (ver _cache_path) e reutilizado
+          enquanto o feather não for modificado.
+
+        Raises
+        ------
+        ConfigError
+            Se dac ou imu não estiverem configurados.
         """                
-        if self.is_config():
-                self.fir = FIRNLMS(memorysize=2000)
-                x = self.data[self.dac].values - self.data[self.dac].mean()
-                y = self.data[self.imu].values - self.data[self.imu].mean()
-                self.fir.run(x,y)
+        if not self.is_config():
+            raise ConfigError()
+
+        mtime = os.path.getmtime(self.path)
+        cache_path = self._cache_path()
+        try:
+            with np.load(cache_path) as cached:
+                if (cached['format'] == _CACHE_FORMAT and cached['mtime'] == mtime
+                        and cached['ww'].size == _FIR_MEMORYSIZE):
+                    self.ww = cached['ww']
+                    self.__dict__.pop('fir_freq', None)
+                    return None
+        except Exception:
+            pass  # Cache ausente, de outra versão ou corrompido: recalcula
+
+        fir = FIRNLMS(memorysize=_FIR_MEMORYSIZE)
+        x, y = self._xy()
+        fir.run(x,y)
+        self.ww = np.asarray(fir.ww)
+        _save_cache(cache_path, ww=self.ww, mtime=mtime, format=_CACHE_FORMAT)
+        # Descarta a resposta em frequência calculada para a resposta ao impulso anterior
+        self.__dict__.pop('fir_freq', None)
+    
+    @cached_property
+    def fir_freq(self) -> tuple:
+        """
+        Resposta ao impulso no domínio da frequência, calculada uma única vez por (self.ww).
+        * dac e imu precisam estar configurados.
+        """
+        if self.ww is None:
+            self.generate_fir()
+        return _rfft_response(self.ww, fs=_FS)
     
     def generate_fir_freq(self) -> None:
         """
         Calcula a resposta ao impulso no domínio da frequência e armazena em (self.fir_freq).
         * dac e imu precisam estar configurados.
         """        
-        try:
-            self.fir_freq = easyFourier(self.fir.ww,fs=416)
-        except AttributeError:
+        if self.ww is None:
             self.generate_fir()
-            self.generate_fir_freq()
+        self.fir_freq = _rfft_response(self.ww, fs=_FS)
     
     def get_log(self) -> str:
         """
@@ -100,13 +239,12 @@ class DataHolder():
         str
             Tabela de logs em formato str.
         """        
-        log = f"{'Tempo':^10}|{'Log':>8}\n{'―'*26}"
-        for line in self.data.getLogs():
-            log += (f"\n {line[0]:<9}| {line[1]}")
+        lines = [f"{'Tempo':^10}|{'Log':>8}", '―'*26]
+        lines.extend(f" {line[0]:<9}| {line[1]}" for line in self.data.getLogs())
         
-        return log
+        return "\n".join(lines)
     
-    def get_scatters(self, imus:list[str]= ['imu2accz', 'imu1accz']) -> list[go.Scatter]:
+    def get_scatters(self, imus:list[str]= ['imu2accz', 'imu1accz']) -> list[go.Scattergl]:
         """
         Plota o gráfico de dispersão dos dados armazenados.
 
@@ -115,37 +253,30 @@ class DataHolder():
         imus : list[str], optional
             Lista de imus e variáveis a serem plotados. Por padrão ['imu2accz', 'imu1accz']
         """        
-        traces = []
-        for imu in imus:
-            traces.append(go.Scatter(x=self.data['time'], y=self.data[imu], name=imu))
-        return traces
+        # Scattergl (WebGL) renderiza capturas longas muito mais rápido que o SVG de go.Scatter
+        time = self.data['time']
+        return [go.Scattergl(x=time, y=self.data[imu], mode='lines', name=imu) for imu in imus]
         
-    def get_fir(self) -> go.Scatter:
+    def get_fir(self) -> go.Scattergl:
         """
-        Plota o gráfico da resposta ao impulso armazenada em (self.fir).
-        Calcula (self.fir) caso este não exista.
+        Plota o gráfico da resposta ao impulso armazenada em (self.ww).
+        Calcula (self.ww) caso este não exista.
         """        
-        try:
-            y = self.fir.ww
-            x = list(range(len(self.fir.ww)))
-            trace = go.Scatter(x=x, y=y, mode='lines', name='Resposta ao Impulso')
-        except AttributeError:
+        if self.ww is None:
             self.generate_fir()
-            trace = self.get_fir()
-            
+
+        y = self.ww
+        x = list(range(len(y)))
+        trace = go.Scattergl(x=x, y=y, mode='lines', name='Resposta ao Impulso')
         return trace
     
-    def get_fir_freq(self) -> go.Scatter:
+    def get_fir_freq(self) -> go.Scattergl:
         """
         Plota o gráfico da resposta ao impulso no domínio da frequência armazenada em (self.fir_freq).
         Calcula (self.fir_freq) caso este não exista.
         """        
-        try:
-            y, x = self.fir_freq
-            trace = go.Scatter(x=x, y=y, mode='lines', name='Resposta ao Impulso em Frequência') 
-        except AttributeError:
-            self.generate_fir_freq()
-            trace = self.get_fir_freq()
+        y, x = self.fir_freq
+        trace = go.Scattergl(x=x, y=y, mode='lines', name='Resposta ao Impulso em Frequência') 
         return trace
 
 
@@ -175,48 +306,92 @@ def drive_importer(url: str) -> str:
     return folder_path
 
 
-def main(path: str|os.PathLike, graphs: list[str], dac: int, plot_all: bool = False):
-    def plot_data(feather_path):
-        nonlocal graphs, dac
-        data = DataHolder(feather_path, dac=f'dac{dac}', imu='imu2accz')
-        fig = make_subplots(2, 2)
-        fig.update_layout(title=data.name)
-        get_trace = {'scatter': data.get_scatters,
-                     'impulse':  data.get_fir,
-                     'freq':    data.get_fir_freq}
-        
-        if 'all' in graphs:
-            graphs = list(get_trace.keys())
-        
-        traces = []
-        for graph in graphs:
-            traces.append(get_trace[graph]())
-        
-        col=1
-        if 'scatter' in graphs:
-            scatters = traces.pop(0)
-            for i, trace in enumerate(scatters):
-            	fig.add_trace(trace, row=i+1, col=col)
-            col+=1
-        
-        for i, trace in enumerate(traces):
+def _load_holder(feather_path: str|os.PathLike, dac: int) -> DataHolder:
+    """
+    Cria o DataHolder de um arquivo com a configuração usada por main (dac{dac} e 'imu2accz').
+    """
+    return DataHolder(feather_path, dac=f'dac{dac}', imu='imu2accz')
+
+
+def compute_response(feather_path: str|os.PathLike, dac: int) -> tuple[np.ndarray, tuple[np.ndarray, np.ndarray]]:
+    """
+    Calcula a resposta ao impulso (NLMS) de um arquivo feather e sua resposta em frequência.
+    Retorna apenas arrays, podendo ser executada em outro processo.
+
+    Parameters
+    ----------
+    feather_path : str | os.PathLike
+        Caminho do arquivo feather que contém os dados.
+    dac : int
+        dac utilizado (1, 2...).
+
+    Returns
+    -------
+    tuple[np.ndarray, tuple[np.ndarray, np.ndarray]]
+        Coeficientes da resposta ao impulso e (módulo, frequências) do seu espectro.
+    """
+    data = _load_holder(feather_path, dac)
+    fir_freq = data.fir_freq
+    return data.ww, fir_freq
+
+
+def build_figure(data: DataHolder, graphs: list[str]) -> go.Figure:
+    """
+    Monta a figura com os gráficos pedidos para os dados de (data), sem exibi-la.
+
+    Parameters
+    ----------
+    data : DataHolder
+        Dados configurados do arquivo a ser plotado.
+    graphs : list[str]
+        Gráficos a serem montados ('scatter', 'impulse', 'freq' ou 'all').
+    """
+    fig = make_subplots(2, 2)
+    fig.update_layout(title=data.name)
+    get_trace = {'scatter': data.get_scatters,
+                 'impulse':  data.get_fir,
+                 'freq':    data.get_fir_freq}
+    
+    if 'all' in graphs:
+        graphs = list(get_trace.keys())
+    
+    traces = []
+    for graph in graphs:
+        traces.append(get_trace[graph]())
+    
+    col=1
+    if 'scatter' in graphs:
+        scatters = traces.pop(0)
+        for i, trace in enumerate(scatters):
             fig.add_trace(trace, row=i+1, col=col)
-        
-        fig.show()
+        col+=1
+    
+    for i, trace in enumerate(traces):
+        fig.add_trace(trace, row=i+1, col=col)
+    
+    return fig
+
 
+def main(path: str|os.PathLike, graphs: list[str], dac: int, plot_all: bool = False):
     if path.startswith('http'):
         print("URL reconhecido.")
         path = drive_importer(path)
         print("Os dados foram baixados do Google Drive.\n")
 
     if os.path.isfile(path):
-        plot_data(path)
+        build_figure(_load_holder(path, dac), graphs).show()
         return None
     
     # Se o caminho aponta uma pasta
-    files = os.listdir(path) 
-    file_paths = [os.path.join(path, file) for file in files]
+    with os.scandir(path) as it:
+        # Arquivos .npz são caches de resposta ao impulso gerados por DataHolder.generate_fir
+        entries = sorted((entry for entry in it if entry.is_file() and not entry.name.endswith('.npz')),
+                         key=lambda entry: entry.name)
+    files = [entry.name for entry in entries]
+    file_paths = [entry.path for entry in entries]
     num_files = len(file_paths)
+    # Índice (a partir de 1) de cada arquivo, para busca por nome em O(1)
+    files_idx = {file: idx for idx, file in enumerate(files, start=1)}
     
     i = 1
     def processar_input(user_input: str):
@@ -235,8 +410,8 @@ def main(path: str|os.PathLike, graphs: list[str], dac: int, plot_all: bool = Fa
             case 'all':
                 plot_all = True
                 return False
-            case str() if user_input in files:
-                i = files.index(user_input)
+            case str() if user_input in files_idx:
+                i = files_idx[user_input]
                 return False
             case int() if user_input <= num_files + 1:
                 i = int(user_input)
@@ -254,13 +429,34 @@ def main(path: str|os.PathLike, graphs: list[str], dac: int, plot_all: bool = Fa
         if i > num_files:
             break
 
+        if plot_all:
+            # NLMS e FFT dos arquivos restantes rodam em paralelo e só os arrays voltam ao processo
+            # principal, que lê os dados brutos, monta as figuras e as exibe na ordem original
+            pending = file_paths[i-1:]
+            needs_response = bool(set(graphs) - {'scatter'})
+            workers = min(os.cpu_count() or 1, len(pending))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                try:
+                    responses = (executor.map(compute_response, pending, repeat(dac))
+                                 if needs_response else repeat(None))
+                    for feather_path, response in zip(pending, responses):
+                        data = _load_holder(feather_path, dac)
+                        if response is not None:
+                            data.ww, data.fir_freq = response
+                        print(f"Plotando arquivo {files[i-1]} ({i}/{num_files})...")
+                        build_figure(data, graphs).show()
+                        i+= 1
+                except KeyboardInterrupt:
+                    # Cancela os arquivos ainda não iniciados em vez de processá-los antes de sair
+                    executor.shutdown(cancel_futures=True)
+                    raise
+            break
+
         print(f"Plotando arquivo {files[i-1]} ({i}/{num_files})...")
-        plot_data(file_paths[i-1])
+        build_figure(_load_holder(file_paths[i-1], dac), graphs).show()
 
         i+= 1
 
-        if plot_all: continue
-
         user_in = input("Plot concluído. Pressione enter para seguir ou digite sua opção: ")
         if processar_input(user_in): break
 
@@ -1,8 +1,6 @@
 """
 CLI para plot e verificação de integridade de dados gerados com o firmware ActVib.
 """
-
-from DataChecker import main
     
 if "__main__" == __name__:
     import argparse
@@ -44,4 +42,7 @@ if "__main__" == __name__:
     
     selected_graphs = [graph_types[i] for i in range(len(graph_types)) if graph_input_arr[i]]
     
+    # Importado somente após o parse: plotly e ActVibModules não são carregados para --help ou erros de uso
+    from DataChecker import main
+    
     main(args.path, selected_graphs, args.dac, args.all_files)